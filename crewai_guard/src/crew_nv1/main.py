@@ -4,105 +4,277 @@ Exemplo criando com a biblioteca sem utilizar o hub
 
 import os
 import re # Importar regex para contar frases de forma um pouco melhor
+import asyncio
+import contextvars
 from dotenv import load_dotenv
 import sys
-from typing import Union
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Union
 
-# --- Imports do CrewAI ---
-from crewai import Crew, Process, Agent, Task, LLM
-from crewai_tools import SerperDevTool # Ferramenta de busca simples
+# Os imports da CrewAI e do LiteLLM ficam dentro de get_crew(), e os do Guardrails
+# dentro de get_sentence_guard(): o módulo carrega mais rápido e só paga esse custo
+# quando a crew ou o Guard são de fato construídos.
+if TYPE_CHECKING:
+    from crewai import Crew
+    from guardrails import Guard
 
-# --- Imports do Guardrails AI ---
-from guardrails import Guard
-from guardrails.validators import Validator, register_validator # Mudança para nova importação
-from guardrails.classes.validation.validation_result import PassResult, FailResult # Importar classes de resultado
+# Carregar variáveis de ambiente do arquivo .env (uma vez por árvore de processos; ver README)
+if not os.environ.get("CREWAI_GUARDRAILS_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["CREWAI_GUARDRAILS_DOTENV_LOADED"] = "1"
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# --- Logging e Verbosidade ---
+# O modo verbose da CrewAI formata e imprime cada passo dos agentes, o que pesa
+# quando várias crews rodam em lote; fica desligado por padrão (CREW_VERBOSE=1 liga).
+VERBOSE = os.getenv("CREW_VERBOSE", "0") == "1"
+logger = logging.getLogger(__name__)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-llm = LLM(model='gemini/gemini-2.0-flash-001')
+# Uma frase: trecho entre delimitadores (., ! ou ?) com pelo menos um caractere
+# visível. Compilado uma única vez no carregamento do módulo.
+_SENTENCE_RE = re.compile(r"[^.!?\s][^.!?]*")
 
-# --- Definição do Validador Guardrails (Nível 1) ---
-@register_validator(name="has-exactly-n-sentences", data_type="string")
-class HasExactlyNSentences(Validator):
+def _count_sentences(text: str) -> int:
+    """Conta as frases de `text` (trechos não vazios entre ., ! e ?)."""
+    return len(_SENTENCE_RE.findall(text))
+
+# --- Contagem Incremental Durante o Streaming ---
+# Estado da execução corrente: número de frases esperado, texto recebido na chamada
+# de LLM corrente e se o limite já foi ultrapassado. A ContextVar acompanha o
+# kickoff_async até a thread que executa a crew, então execuções paralelas do
+# run_batch não se misturam; como o estado é um objeto mutável, o que os listeners
+# gravam nele na thread da crew é visto de volta por quem chamou o kickoff.
+_stream_state: contextvars.ContextVar[dict | None] = contextvars.ContextVar("stream_state", default=None)
+
+class SentenceLimitExceeded(Exception):
+    """Lançada por kickoff_with_sentence_limit quando o resumo passou do número de frases esperado."""
+
+def _reset_stream_buffer(source, event):
+    state = _stream_state.get()
+    if state is not None:
+        state["buffer"] = ""
+
+def _check_sentence_limit(source, event):
+    state = _stream_state.get()
+    if state is None or state["exceeded"]:
+        return
+    state["buffer"] += event.chunk
+    # Só conta o texto após "Final Answer:"; antes disso vem o raciocínio do agente
+    _, marker, answer = state["buffer"].partition("Final Answer:")
+    # A contagem nunca diminui conforme chegam novos chunks: se já passou de n,
+    # a validação final vai falhar e não adianta gerar o resto da resposta
+    if marker and _count_sentences(answer) > state["expected"]:
+        state["exceeded"] = True
+        # A exceção só interrompe o streaming: a CrewAI a captura dentro do LLM e
+        # devolve o texto parcial como resposta final. Quem chamou o kickoff
+        # descobre o estouro pela marca no estado (ver kickoff_with_sentence_limit).
+        raise SentenceLimitExceeded(f"O resumo já passou de {state['expected']} frases; geração interrompida.")
+
+async def kickoff_with_sentence_limit(crew: "Crew", inputs: dict, n_sentences: int):
     """
-    Valida se o texto fornecido contém exatamente N frases.
-    Conta frases baseando-se nos delimitadores ., ! e ?.
+    Executa `crew` com a contagem incremental de frases ativa e retorna o CrewOutput.
+    Se o streaming do escritor passou de `n_sentences` frases, a geração é
+    interrompida e SentenceLimitExceeded é lançada aqui, em vez de a resposta
+    parcial seguir como resultado.
     """
-    def __init__(self, n: int, on_fail: str | None = None):
-        super().__init__(on_fail=on_fail, n=n)
-        self._n = n # Armazena o número de frases esperado
-
-    def validate(self, value: str, metadata: dict) -> Union[PassResult, FailResult]:
-        """Executa a lógica de validação."""
-        if not isinstance(value, str):
-            return FailResult(error_message="Input should be a string.")
-
-        # Contagem de frases um pouco mais robusta que value.count('.')
-        # Divide por delimitadores e remove strings vazias resultantes
-        delimiters = r"[.!?]"
-        sentences = [s for s in re.split(delimiters, value) if s.strip()]
-        count = len(sentences)
-
-        if count == self._n:
-            # Retorna PassResult se a validação passar
-            return PassResult()
-        else:
-            # Retorna FailResult com uma mensagem de erro se falhar
-            return FailResult(
-                error_message=f"Esperava {self._n} frases, mas encontrou {count}."
-            )
+    state = {"expected": n_sentences, "buffer": "", "exceeded": False}
+    _stream_state.set(state)
+    result = await crew.kickoff_async(inputs=inputs)
+    if state["exceeded"]:
+        raise SentenceLimitExceeded(f"O resumo passou de {n_sentences} frases; geração interrompida no streaming.")
+    return result
+
+# --- Definição do Validador Guardrails (Nível 1) ---
+@lru_cache(maxsize=1)
+def _get_sentence_validator_class() -> type:
+    """Define e registra o validador HasExactlyNSentences no primeiro uso."""
+    # --- Imports do Guardrails AI ---
+    from guardrails.validators import Validator, register_validator # Mudança para nova importação
+    from guardrails.classes.validation.validation_result import PassResult, FailResult # Importar classes de resultado
+
+    @register_validator(name="has-exactly-n-sentences", data_type="string")
+    class HasExactlyNSentences(Validator):
+        """
+        Valida se o texto fornecido contém exatamente N frases.
+        Conta frases baseando-se nos delimitadores ., ! e ?.
+        """
+        def __init__(self, n: int, on_fail: str | None = None):
+            super().__init__(on_fail=on_fail, n=n)
+            self._n = n # Armazena o número de frases esperado
+
+        def validate(self, value: str, metadata: dict) -> Union[PassResult, FailResult]:
+            """Executa a lógica de validação."""
+            if not isinstance(value, str):
+                return FailResult(error_message="Input should be a string.")
+
+            # Contagem de frases um pouco mais robusta que value.count('.')
+            # Conta os trechos não vazios entre delimitadores direto no motor de
+            # regex, sem montar a lista do split nem chamar strip() em cada trecho
+            count = _count_sentences(value)
+
+            if count == self._n:
+                # Retorna PassResult se a validação passar
+                return PassResult()
+            else:
+                # Retorna FailResult com uma mensagem de erro se falhar
+                return FailResult(
+                    error_message=f"Esperava {self._n} frases, mas encontrou {count}."
+                )
+
+    return HasExactlyNSentences
+
+@lru_cache(maxsize=16)
+def get_sentence_guard(n: int) -> "Guard":
+    """Retorna o Guard que exige exatamente `n` frases, construído uma única vez por `n`."""
+    from guardrails import Guard
+
+    HasExactlyNSentences = _get_sentence_validator_class()
+    # Usando 'exception' como on_fail para simplicidade no Nível 1
+    return Guard().use(HasExactlyNSentences(n=n, on_fail="exception"))
+
+# --- Cache das Buscas no Serper ---
+# Em desenvolvimento o mesmo tópico é pesquisado a cada execução; cada busca é uma
+# requisição paga. Os resultados ficam em disco (.serper_cache/) por SEARCH_CACHE_TTL
+# segundos. Desative com SEARCH_CACHE=0.
+SEARCH_CACHE_TTL = 24 * 60 * 60
+
+def _build_search_tool():
+    """Cria o SerperDevTool, com cache em disco dos resultados quando SEARCH_CACHE=1 (padrão)."""
+    from crewai_tools import SerperDevTool
+
+    if os.getenv("SEARCH_CACHE", "1") != "1":
+        return SerperDevTool()
+
+    import json
+    from diskcache import Cache
+
+    search_cache = Cache(".serper_cache")
+
+    class CachedSerperDevTool(SerperDevTool):
+        def _run(self, **kwargs):
+            # A chave é a própria consulta (search_query e demais argumentos da busca)
+            key = json.dumps(kwargs, sort_keys=True, default=str)
+            result = search_cache.get(key)
+            if result is None:
+                result = super()._run(**kwargs)
+                search_cache.set(key, result, expire=SEARCH_CACHE_TTL)
+            return result
+
+    return CachedSerperDevTool()
 
 # --- Configuração da CrewAI (Nível 1) ---
 
-# Ferramenta de pesquisa (DuckDuckGo é gratuito e não precisa de API key)
-search_tool = SerperDevTool()
-
-# Agente Pesquisador
-researcher = Agent(
-    role='Pesquisador de IA',
-    goal='Encontrar informações concisas sobre o tópico {topic}',
-    backstory='Você é um assistente de pesquisa IA eficiente, bom em encontrar fatos chave.',
-    tools=[search_tool],
-    llm=llm,
-    verbose=True, # Mostrar o que o agente está fazendo
-    allow_delegation=False
-)
-
-# Agente Escritor
-writer = Agent(
-    role='Escritor de Resumos IA',
-    goal='Escrever um resumo conciso de {n_sentences} frases sobre as descobertas da pesquisa sobre {topic}',
-    backstory='Você é um assistente de escrita IA, especializado em criar resumos curtos e informativos.',
-    verbose=True,
-    llm=llm,
-    allow_delegation=False
-)
-
-# Tarefas
-research_task = Task(
-    description='Pesquise sobre o tópico: {topic}. Colete 3-5 fatos ou pontos chave.',
-    expected_output='Uma lista de pontos chave sobre {topic}.',
-    agent=researcher
-)
-
-write_task = Task(
-    description='Escreva um resumo conciso de exatamente {n_sentences} frases baseado nas descobertas da pesquisa sobre {topic}.',
-    expected_output='Um resumo bem escrito sobre {topic} contendo exatamente {n_sentences} frases.',
-    agent=writer,
-    context=[research_task] # Usa a saída da tarefa anterior como contexto
-)
-
-# Criando a Crew
-crew = Crew(
-    agents=[researcher, writer],
-    tasks=[research_task, write_task],
-    process=Process.sequential,
-    verbose=True
-)
+@lru_cache(maxsize=1)
+def get_crew() -> "Crew":
+    """
+    Constrói a crew (LLMs, ferramenta, agentes e tarefas) na primeira chamada e
+    retorna a mesma instância nas seguintes. Processos de longa duração que
+    importam este módulo não pagam o custo de montagem a cada requisição.
+    """
+    # --- Imports do CrewAI ---
+    from crewai import Crew, Process, Agent, Task, LLM
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMStreamChunkEvent
+
+    # --- Imports do LiteLLM (camada usada pelo LLM da CrewAI) ---
+    import httpx
+    import litellm
+    from litellm.caching import Cache
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+    # --- Cache de Respostas do LLM ---
+    # Cache em disco, desligado por padrão (LLM_CACHE=1 liga; ver README)
+    if os.getenv("LLM_CACHE", "0") == "1":
+        litellm.cache = Cache(type="disk", disk_cache_dir=".llm_cache")
+
+    # --- Pool de Conexões HTTP do LLM ---
+    # Cliente HTTP reaproveitado entre as chamadas ao LLM (ver README)
+    http_client = HTTPHandler(client=httpx.Client(
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+        timeout=httpx.Timeout(600.0, connect=10.0),
+    ))
+
+    llm = LLM(model='gemini/gemini-2.0-flash-001', client=http_client)
+    # O escritor recebe a resposta em streaming, para que a contagem de frases
+    # possa interromper a geração assim que o limite for ultrapassado (sem `client`:
+    # no streaming o handler do Gemini abre a própria conexão de qualquer forma)
+    writer_llm = LLM(model='gemini/gemini-2.0-flash-001', stream=True)
+    # Registra os listeners da contagem incremental de frases
+    crewai_event_bus.on(LLMCallStartedEvent)(_reset_stream_buffer)
+    crewai_event_bus.on(LLMStreamChunkEvent)(_check_sentence_limit)
+
+    # Ferramenta de pesquisa (DuckDuckGo é gratuito e não precisa de API key)
+    search_tool = _build_search_tool()
+
+    # Agente Pesquisador
+    researcher = Agent(
+        role='Pesquisador de IA',
+        goal='Encontrar informações concisas sobre o tópico {topic}',
+        backstory='Você é um assistente de pesquisa IA eficiente, bom em encontrar fatos chave.',
+        tools=[search_tool],
+        llm=llm,
+        verbose=VERBOSE, # Mostrar o que o agente está fazendo
+        allow_delegation=False
+    )
+
+    # Agente Escritor
+    writer = Agent(
+        role='Escritor de Resumos IA',
+        goal='Escrever um resumo conciso de {n_sentences} frases sobre as descobertas da pesquisa sobre {topic}',
+        backstory='Você é um assistente de escrita IA, especializado em criar resumos curtos e informativos.',
+        verbose=VERBOSE,
+        llm=writer_llm,
+        allow_delegation=False
+    )
+
+    # Tarefas
+    research_task = Task(
+        description='Pesquise sobre o tópico: {topic}. Colete 3-5 fatos ou pontos chave.',
+        expected_output='Uma lista de pontos chave sobre {topic}.',
+        agent=researcher
+    )
+
+    write_task = Task(
+        description='Escreva um resumo conciso de exatamente {n_sentences} frases baseado nas descobertas da pesquisa sobre {topic}.',
+        expected_output='Um resumo bem escrito sobre {topic} contendo exatamente {n_sentences} frases.',
+        agent=writer,
+        context=[research_task] # Usa a saída da tarefa anterior como contexto
+    )
+
+    # Criando a Crew
+    return Crew(
+        agents=[researcher, writer],
+        tasks=[research_task, write_task],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+# --- Execução em Lote ---
+# Limite de kickoffs simultâneos (ver README)
+MAX_CONCURRENT_KICKOFFS = 32
+
+async def run_batch(topics: list[str], n_sentences: int):
+    """
+    Executa a crew para vários tópicos em paralelo.
+    Cada tópico roda em uma cópia da crew (como no kickoff_for_each_async),
+    com no máximo MAX_CONCURRENT_KICKOFFS execuções simultâneas.
+    Retorna a lista de resultados na mesma ordem de `topics`: o CrewOutput de cada
+    tópico, ou a exceção que o fez falhar (por exemplo SentenceLimitExceeded), sem
+    descartar os demais.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_KICKOFFS)
+
+    async def _kickoff(topic: str):
+        async with semaphore:
+            inputs = {'topic': topic, 'n_sentences': n_sentences}
+            return await kickoff_with_sentence_limit(get_crew().copy(), inputs, n_sentences)
+
+    return await asyncio.gather(*[_kickoff(topic) for topic in topics], return_exceptions=True)
 
 # --- Execução e Validação ---
-if __name__ == "__main__":
+async def main():
     # Define o tópico e o número de frases desejado
     topic = "o futuro da computação quântica no Brasil"
     num_sentences = 3
@@ -110,32 +282,46 @@ if __name__ == "__main__":
     # Define os inputs para a crew
     inputs = {'topic': topic, 'n_sentences': num_sentences}
 
-    print(f"--- Iniciando a CrewAI para pesquisar e resumir '{topic}' em {num_sentences} frases ---")
+    logger.info("--- Iniciando a CrewAI para pesquisar e resumir '%s' em %s frases ---", topic, num_sentences)
     # Executa a Crew
+    # write_task depende de research_task (context=[research_task]), então as
+    # duas tarefas formam uma única cadeia e seguem em sequência. O kickoff
+    # assíncrono libera o event loop enquanto o LLM responde, permitindo
+    # executar várias crews em paralelo.
     # Tratamento de erro básico para a execução da crew
     try:
-        result = crew.kickoff(inputs=inputs)
+        crew = get_crew()
+        result = await kickoff_with_sentence_limit(crew, inputs, num_sentences)
         crew_raw_output = result.raw
-        print("\n--- Saída Bruta da CrewAI ---")
-        print(crew_raw_output)
+        logger.info("\n--- Saída Bruta da CrewAI ---")
+        logger.info("%s", crew_raw_output)
+    except SentenceLimitExceeded as e:
+        # Interrompido no streaming: a resposta (parcial) já não atende ao critério
+        logger.error("\n--- Falha na Validação (durante o streaming) ---")
+        logger.error("A saída não atende ao critério de %s frases.", num_sentences)
+        logger.error("Erro detalhado: %s", e)
+        return
     except Exception as e:
-        print(f"\n--- Erro durante a execução da CrewAI ---")
-        print(f"Erro: {e}")
+        logger.error("\n--- Erro durante a execução da CrewAI ---")
+        logger.error("Erro: %s", e)
         sys.exit(1) # Termina se a crew falhar
 
-    print(f"\n--- Validando a saída com Guardrails AI (Esperando {num_sentences} frases) ---")
+    logger.info("\n--- Validando a saída com Guardrails AI (Esperando %s frases) ---", num_sentences)
     # Configura o Guardrails para validar a saída
-    # Usando 'exception' como on_fail para simplicidade no Nível 1
-    guard = Guard().use(HasExactlyNSentences(n=num_sentences, on_fail="exception"))
+    guard = get_sentence_guard(num_sentences)
 
     # Valida a saída bruta da Crew
     try:
         validated_output = guard.validate(crew_raw_output)
-        print("\n--- Validação do Guardrails AI bem-sucedida ---")
-        print("A saída está no formato esperado (exatamente 3 frases).")
-        print("\n--- Saída Final Validada ---")
-        print(validated_output) # Se passar, validated_output é igual a crew_raw_output
+        logger.info("\n--- Validação do Guardrails AI bem-sucedida ---")
+        logger.info("A saída está no formato esperado (exatamente 3 frases).")
+        logger.info("\n--- Saída Final Validada ---")
+        logger.info("%s", validated_output) # Se passar, validated_output é igual a crew_raw_output
     except Exception as e:
-        print(f"\n--- Falha na Validação do Guardrails AI ---")
-        print(f"A saída não atende ao critério de {num_sentences} frases.")
-        print(f"Erro detalhado: {e}")
+        logger.error("\n--- Falha na Validação do Guardrails AI ---")
+        logger.error("A saída não atende ao critério de %s frases.", num_sentences)
+        logger.error("Erro detalhado: %s", e)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
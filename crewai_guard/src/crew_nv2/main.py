@@ -7,7 +7,10 @@ O modelo Pydantic é uma maneira de definir e validar a estrutura dos dados que
 import os
 from dotenv import load_dotenv
 import sys
-from typing import Optional # Necessário para campos opcionais no Pydantic
+import logging
+import asyncio
+import json
+from typing import List, Optional, Union # Necessário para campos opcionais no Pydantic
 
 # --- Imports Pydantic ---
 from pydantic import BaseModel, Field
@@ -16,19 +19,62 @@ from pydantic import BaseModel, Field
 from crewai import Crew, Process, Agent, Task, LLM
 
 
+# --- Imports do LiteLLM (camada usada pelo LLM da CrewAI) ---
+import httpx
+import litellm
+from litellm.caching import Cache
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
 # --- Imports do Guardrails AI (Não usados explicitamente neste nível) ---
 # from guardrails import Guard # Não precisamos no Nível 2
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Carregar variáveis de ambiente do arquivo .env (uma vez por árvore de processos; ver README)
+if not os.environ.get("CREWAI_GUARDRAILS_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["CREWAI_GUARDRAILS_DOTENV_LOADED"] = "1"
+
+# --- Logging e Verbosidade ---
+# O modo verbose da CrewAI formata e imprime cada passo dos agentes, o que pesa
+# quando várias crews rodam em lote; fica desligado por padrão (CREW_VERBOSE=1 liga).
+VERBOSE = os.getenv("CREW_VERBOSE", "0") == "1"
+logger = logging.getLogger(__name__)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+# --- Cache de Respostas do LLM ---
+# Cache em disco, desligado por padrão (LLM_CACHE=1 liga; ver README)
+if os.getenv("LLM_CACHE", "0") == "1":
+    litellm.cache = Cache(type="disk", disk_cache_dir=".llm_cache")
+
+# --- Pool de Conexões HTTP do LLM ---
+# Cliente HTTP reaproveitado entre as chamadas ao LLM (ver README)
+http_client = HTTPHandler(client=httpx.Client(
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+    timeout=httpx.Timeout(600.0, connect=10.0),
+))
+
+# --- Limite de Tamanho do Texto de Entrada ---
+# O texto entra literalmente na descrição da tarefa; textos longos aumentam o
+# prompt (e o custo/latência) sem mudar o sentimento. ~2000 caracteres equivalem
+# a cerca de 500 tokens.
+MAX_INPUT_CHARS = 2000
+
+def truncate_text(text: str, max_chars: int = MAX_INPUT_CHARS) -> str:
+    """Corta `text` em no máximo `max_chars` caracteres, sem quebrar a última palavra."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    # Volta até o último espaço para não deixar meia palavra no final
+    head, sep, _ = cut.rpartition(" ")
+    return (head if sep else cut).rstrip() + "..."
 
 # --- Configuração do LLM ---
 try:
-    llm = LLM(model='gemini/gemini-2.0-flash-001')
-    print(f"Usando LLM: {llm}")
+    llm = LLM(model='gemini/gemini-2.0-flash-001', client=http_client)
+    logger.info("Usando LLM: %s", llm)
 except Exception as e:
-    print(f"Erro ao inicializar o LLM: {e}")
-    print("Verifique suas variáveis de ambiente (ex: GEMINI_API_KEY ou OPENAI_API_KEY).")
+    logger.error("Erro ao inicializar o LLM: %s", e)
+    logger.error("Verifique suas variáveis de ambiente (ex: GEMINI_API_KEY ou OPENAI_API_KEY).")
     sys.exit(1)
 
 # --- Definição do Modelo Pydantic para Saída Estruturada (Nível 2) ---
@@ -37,6 +83,9 @@ class SentimentAnalysis(BaseModel):
     summary: str = Field(description="Um breve resumo justificando a análise de sentimento.")
     confidence_score: Optional[float] = Field(None, description="Score de confiança da análise (0.0 a 1.0), se aplicável.")
 
+class SentimentAnalysisBatch(BaseModel):
+    items: List[SentimentAnalysis] = Field(description="Uma análise de sentimento por texto, na mesma ordem dos textos de entrada.")
+
 # --- Configuração da CrewAI (Nível 2) ---
 
 # Agente Analista de Sentimento
@@ -45,7 +94,7 @@ sentiment_analyst = Agent(
     goal='Analisar o sentimento do texto fornecido e fornecer um resumo.',
     backstory='Você é um especialista em processamento de linguagem natural com foco em análise de sentimento. Você identifica com precisão o tom emocional em textos.',
     llm=llm,
-    verbose=True,
+    verbose=VERBOSE,
     allow_delegation=False
 )
 
@@ -54,7 +103,7 @@ report_writer = Agent(
     role='Escritor de Relatórios',
     goal='Criar um pequeno relatório baseado na análise de sentimento fornecida.',
     backstory='Você transforma dados analíticos em relatórios claros e compreensíveis para stakeholders.',
-    verbose=True,
+    verbose=VERBOSE,
     llm=llm,
     allow_delegation=False
 )
@@ -79,44 +128,111 @@ crew = Crew(
     agents=[sentiment_analyst, report_writer],
     tasks=[analysis_task, report_task],
     process=Process.sequential,
-    verbose=True
+    verbose=VERBOSE
 )
 
+# --- Crew de Análise em Lote ---
+# Vários textos na mesma chamada ao LLM: uma ida e volta por bloco de textos, em vez
+# de uma por texto. Só a análise é feita em lote; o relatório fica para a crew acima.
+batch_analysis_task = Task(
+    description='Analise o sentimento de cada um dos textos da seguinte lista JSON: {text_inputs_json}. Para cada texto, determine se é positivo, negativo ou neutro e forneça um breve resumo da sua análise.',
+    expected_output='Um objeto Pydantic do tipo SentimentAnalysisBatch com uma análise (sentimento, resumo e opcionalmente score de confiança) por texto, na mesma ordem da lista.',
+    agent=sentiment_analyst,
+    output_pydantic=SentimentAnalysisBatch
+)
+
+batch_crew = Crew(
+    agents=[sentiment_analyst],
+    tasks=[batch_analysis_task],
+    process=Process.sequential,
+    verbose=VERBOSE
+)
+
+# --- Execução em Lote ---
+# Limite de kickoffs simultâneos (ver README)
+MAX_CONCURRENT_KICKOFFS = 32
+# Textos por prompt: blocos maiores economizam chamadas, mas aproximam o prompt
+# do limite de contexto e deixam cada resposta mais lenta
+MAX_TEXTS_PER_PROMPT = 16
+
+async def run_batch(texts: list[str]) -> list[Union[SentimentAnalysis, Exception]]:
+    """
+    Analisa o sentimento de vários textos.
+    Os textos são agrupados em blocos de até MAX_TEXTS_PER_PROMPT, e cada bloco é
+    analisado em uma única chamada ao LLM por uma cópia da batch_crew, com no
+    máximo MAX_CONCURRENT_KICKOFFS blocos simultâneos.
+    Um bloco cuja resposta não traz uma análise por texto é dividido ao meio e
+    reenviado, até chegar a textos individuais; os outros blocos não são afetados.
+    Retorna uma SentimentAnalysis por texto, na mesma ordem de `texts`; no lugar
+    dos textos que não puderam ser analisados fica a exceção correspondente.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_KICKOFFS)
+
+    async def _kickoff(chunk: list[str]) -> list[Union[SentimentAnalysis, Exception]]:
+        text_inputs_json = json.dumps([truncate_text(text) for text in chunk], ensure_ascii=False)
+        try:
+            async with semaphore:
+                result = await batch_crew.copy().kickoff_async(inputs={'text_inputs_json': text_inputs_json})
+        except Exception as e:
+            return [e] * len(chunk)
+        batch: SentimentAnalysisBatch = result.tasks_output[0].pydantic
+        if batch is not None and len(batch.items) == len(chunk):
+            return batch.items
+        error = ValueError(f"Esperava {len(chunk)} análises no bloco, mas o LLM retornou {len(batch.items) if batch else 0}.")
+        if len(chunk) == 1:
+            return [error]
+        # Sem como saber qual texto ficou de fora, o bloco é reenviado em duas metades
+        logger.warning("%s Reenviando o bloco em duas partes.", error)
+        middle = len(chunk) // 2
+        halves = await asyncio.gather(_kickoff(chunk[:middle]), _kickoff(chunk[middle:]))
+        return halves[0] + halves[1]
+
+    chunks = [texts[i:i + MAX_TEXTS_PER_PROMPT] for i in range(0, len(texts), MAX_TEXTS_PER_PROMPT)]
+    results = await asyncio.gather(*[_kickoff(chunk) for chunk in chunks])
+    return [analysis for chunk_result in results for analysis in chunk_result]
+
 # --- Execução ---
-if __name__ == "__main__":
+async def main():
     # Define o texto de entrada
     text_to_analyze = "Adorei o novo celular! A câmera é incrível e a bateria dura muito. No entanto, achei o preço um pouco elevado."
 
     # Define os inputs para a crew
-    inputs = {'text_input': text_to_analyze}
+    inputs = {'text_input': truncate_text(text_to_analyze)}
 
-    print(f"--- Iniciando a CrewAI para analisar o sentimento do texto ---")
+    logger.info("--- Iniciando a CrewAI para analisar o sentimento do texto ---")
     # Executa a Crew
+    # report_task depende de analysis_task (context=[analysis_task]), então as
+    # tarefas continuam em sequência; o kickoff assíncrono apenas libera o
+    # event loop enquanto o LLM responde.
     try:
-        result = crew.kickoff(inputs=inputs)
+        result = await crew.kickoff_async(inputs=inputs)
 
-        print("\n--- Execução da CrewAI Concluída ---")
+        logger.info("\n--- Execução da CrewAI Concluída ---")
 
         # Acessando a saída estruturada da primeira tarefa
         analysis_output : SentimentAnalysis = analysis_task.output.pydantic
         if analysis_output:
-            print("\n--- Saída Estruturada da Tarefa de Análise (Pydantic) ---")
-            print(f"Sentimento: {analysis_output.sentiment}")
-            print(f"Resumo: {analysis_output.summary}")
+            logger.info("\n--- Saída Estruturada da Tarefa de Análise (Pydantic) ---")
+            logger.info("Sentimento: %s", analysis_output.sentiment)
+            logger.info("Resumo: %s", analysis_output.summary)
             if analysis_output.confidence_score:
-                 print(f"Confiança: {analysis_output.confidence_score}")
+                 logger.info("Confiança: %s", analysis_output.confidence_score)
         else:
-            print("\n--- Saída Estruturada da Tarefa de Análise: Falhou ou Vazia ---")
-            print(f"Saída bruta da tarefa 1: {analysis_task.output.raw if analysis_task.output else 'N/A'}")
+            logger.warning("\n--- Saída Estruturada da Tarefa de Análise: Falhou ou Vazia ---")
+            logger.warning("Saída bruta da tarefa 1: %s", analysis_task.output.raw if analysis_task.output else 'N/A')
 
 
-        print("\n--- Saída Final da Crew (Relatório) ---")
-        print(result.raw) # Saída da última tarefa (o relatório)
+        logger.info("\n--- Saída Final da Crew (Relatório) ---")
+        logger.info("%s", result.raw) # Saída da última tarefa (o relatório)
 
     except Exception as e:
-        print(f"\n--- Erro durante a execução da CrewAI ---")
+        logger.error("\n--- Erro durante a execução da CrewAI ---")
         # Imprimir o traceback pode ajudar a depurar
         import traceback
         traceback.print_exc()
         # print(f"Erro: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,6 +7,9 @@ O Guardrails AI é configurado para validar a saída de acordo com o modelo Pyda
 import os
 from dotenv import load_dotenv
 import sys
+import logging
+import asyncio
+from functools import lru_cache
 from typing import Optional, Union
 import warnings
 
@@ -17,6 +20,12 @@ from pydantic import BaseModel, Field, ValidationError
 from crewai import Crew, Process, Agent, Task, LLM
 from crewai.tasks.task_output import TaskOutput
 
+# --- Imports do LiteLLM (camada usada pelo LLM da CrewAI) ---
+import httpx
+import litellm
+from litellm.caching import Cache
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
 # --- Imports do Guardrails AI ---
 from guardrails import Guard
 from guardrails.hub import ValidChoices
@@ -24,16 +33,53 @@ from guardrails.hub import ValidChoices
 # Suprimir o DeprecationWarning específico do asyncio no Guardrails
 warnings.filterwarnings("ignore", message="There is no current event loop", category=DeprecationWarning)
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Carregar variáveis de ambiente do arquivo .env (uma vez por árvore de processos; ver README)
+if not os.environ.get("CREWAI_GUARDRAILS_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["CREWAI_GUARDRAILS_DOTENV_LOADED"] = "1"
+
+# --- Logging e Verbosidade ---
+# O modo verbose da CrewAI formata e imprime cada passo dos agentes, o que pesa
+# quando várias crews rodam em lote; fica desligado por padrão (CREW_VERBOSE=1 liga).
+VERBOSE = os.getenv("CREW_VERBOSE", "0") == "1"
+logger = logging.getLogger(__name__)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+# --- Cache de Respostas do LLM ---
+# Cache em disco, desligado por padrão (LLM_CACHE=1 liga; ver README)
+if os.getenv("LLM_CACHE", "0") == "1":
+    litellm.cache = Cache(type="disk", disk_cache_dir=".llm_cache")
+
+# --- Pool de Conexões HTTP do LLM ---
+# Cliente HTTP reaproveitado entre as chamadas ao LLM (ver README)
+http_client = HTTPHandler(client=httpx.Client(
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+    timeout=httpx.Timeout(600.0, connect=10.0),
+))
+
+# --- Limite de Tamanho do Texto de Entrada ---
+# O texto entra literalmente na descrição da tarefa; textos longos aumentam o
+# prompt (e o custo/latência) sem mudar o sentimento. ~2000 caracteres equivalem
+# a cerca de 500 tokens.
+MAX_INPUT_CHARS = 2000
+
+def truncate_text(text: str, max_chars: int = MAX_INPUT_CHARS) -> str:
+    """Corta `text` em no máximo `max_chars` caracteres, sem quebrar a última palavra."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    # Volta até o último espaço para não deixar meia palavra no final
+    head, sep, _ = cut.rpartition(" ")
+    return (head if sep else cut).rstrip() + "..."
 
 # --- Configuração do LLM ---
 try:
-    llm = LLM(model='gemini/gemini-2.0-flash-001')
-    print(f"Usando LLM: {llm}")
+    llm = LLM(model='gemini/gemini-2.0-flash-001', client=http_client)
+    logger.info("Usando LLM: %s", llm)
 except Exception as e:
-    print(f"Erro ao inicializar o LLM: {e}")
-    print("Verifique suas variáveis de ambiente (ex: GEMINI_API_KEY ou OPENAI_API_KEY).")
+    logger.error("Erro ao inicializar o LLM: %s", e)
+    logger.error("Verifique suas variáveis de ambiente (ex: GEMINI_API_KEY ou OPENAI_API_KEY).")
     sys.exit(1)
     
 # --- Definição do Modelo Pydantic ---
@@ -42,21 +88,16 @@ class SentimentAnalysis(BaseModel):
     summary: str = Field(description="Um breve resumo justificando a análise de sentimento.")
     confidence_score: Optional[float] = Field(None, description="Score de confiança da análise (0.0 a 1.0), se aplicável.")
 
-# --- Função Callback com Guardrails AI ---
-def validate_sentiment_analysis(output: TaskOutput):
+# --- Configuração do Guardrails ---
+SENTIMENT_CHOICES = ['positivo', 'negativo', 'neutro']
+_ALLOWED_SENTIMENTS = frozenset(SENTIMENT_CHOICES)
+
+@lru_cache(maxsize=1)
+def get_sentiment_guard() -> Guard:
     """
-    Callback para validar a saída da tarefa de análise de sentimento
-    usando Guardrails AI.
+    Retorna o Guard da análise de sentimento.
+    Construído uma única vez, e não a cada execução do callback.
     """
-    print("\n--- Executando Callback de Validação Guardrails ---")
-    raw_output = output.raw
-
-    if not raw_output:
-        print("--- Aviso: Saída bruta da tarefa está vazia. Pulando validação. ---")
-        # Poderia lançar um erro aqui se uma saída vazia for inaceitável
-        # raise ValueError("Saída bruta da tarefa de análise está vazia.")
-        return # Ou simplesmente retorna sem validar
-
     # Configurar o Guardrails a partir do modelo Pydantic
     # CORREÇÃO: Removido o argumento 'prompt' daqui
     guard = Guard.for_pydantic(
@@ -65,40 +106,70 @@ def validate_sentiment_analysis(output: TaskOutput):
 
     # Adicionar validadores específicos
     guard.use(
-        ValidChoices(choices=['positivo', 'negativo', 'neutro'], on_fail="exception"),
+        ValidChoices(choices=SENTIMENT_CHOICES, on_fail="exception"),
         on="sentiment"
     )
     # Poderíamos adicionar:
     # from guardrails.hub import InRange
     # guard.use(InRange(min=0.0, max=1.0, on_fail="exception"), on="confidence_score")
+    return guard
+
+# --- Função Callback com Guardrails AI ---
+def validate_sentiment_analysis(output: TaskOutput):
+    """
+    Callback para validar a saída da tarefa de análise de sentimento
+    usando Guardrails AI.
+    """
+    logger.info("\n--- Executando Callback de Validação Guardrails ---")
+    raw_output = output.raw
+
+    if not raw_output:
+        logger.warning("--- Aviso: Saída bruta da tarefa está vazia. Pulando validação. ---")
+        # Poderia lançar um erro aqui se uma saída vazia for inaceitável
+        # raise ValueError("Saída bruta da tarefa de análise está vazia.")
+        return # Ou simplesmente retorna sem validar
 
     try:
-        print(f"Texto bruto a ser validado:\n'''\n{raw_output}\n'''")
+        logger.info("Texto bruto a ser validado:\n'''\n%s\n'''", raw_output)
+
+        # Caminho rápido: o pydantic-core (Rust) faz o parse e a validação do schema
+        # em uma única passada, e o ValidChoices vira um simples teste de pertinência
+        try:
+            analysis = SentimentAnalysis.model_validate_json(raw_output)
+        except ValidationError:
+            analysis = None # Ex.: JSON dentro de ```json```, que o parser do Guardrails extrai
+        if analysis is not None and analysis.sentiment in _ALLOWED_SENTIMENTS:
+            logger.info("--- Validação bem-sucedida! ---")
+            logger.info("Dados Validados: %s", analysis.model_dump())
+            return
+
+        # Fora do caminho rápido, o Guard completo faz a extração e gera o erro do Guardrails
+        guard = get_sentiment_guard()
         validation_outcome = guard.validate(raw_output)
 
         if validation_outcome.validation_passed and validation_outcome.validated_output is not None:
-            print("--- Validação Guardrails bem-sucedida! ---")
+            logger.info("--- Validação Guardrails bem-sucedida! ---")
             validated_data = validation_outcome.validated_output
-            print("Dados Validados:", validated_data)
+            logger.info("Dados Validados: %s", validated_data)
             # Opcional: Tentar anexar ao output para uso futuro (com ressalvas)
             # setattr(output, 'validated_pydantic_guardrails', validated_data)
         elif validation_outcome.validated_output is None and validation_outcome.reask is None:
-             print("--- Validação Guardrails falhou ao extrair/validar dados (resultado None) ---")
+             logger.error("--- Validação Guardrails falhou ao extrair/validar dados (resultado None) ---")
              raise ValueError(f"Guardrails não conseguiu extrair/validar os dados da saída bruta. Erro: {validation_outcome.error}")
         else:
             # Se on_fail="exception" falhar, ele já lança a exceção antes daqui.
             # Este 'else' cobre casos onde on_fail não é 'exception' e a validação falha.
-            print("--- Validação Guardrails Falhou ---")
-            print(f"Sumário da Validação: {validation_outcome.validation_summaries}")
+            logger.error("--- Validação Guardrails Falhou ---")
+            logger.error("Sumário da Validação: %s", validation_outcome.validation_summaries)
             raise ValueError(f"Validação falhou: {validation_outcome.error}")
 
     except ValidationError as pyd_e: # Erro de validação Pydantic
-         print(f"--- Falha na Validação Pydantic (Guardrails) ---")
-         print(f"Erro: {pyd_e}")
+         logger.error("--- Falha na Validação Pydantic (Guardrails) ---")
+         logger.error("Erro: %s", pyd_e)
          raise pyd_e
     except Exception as e: # Outros erros (ex: falha do validador, erro do .validate)
-        print(f"--- Falha na Validação Guardrails (Erro Geral) ---")
-        print(f"Erro: {type(e).__name__}: {e}")
+        logger.error("--- Falha na Validação Guardrails (Erro Geral) ---")
+        logger.error("Erro: %s: %s", type(e).__name__, e)
         raise e
 
 # --- Configuração da CrewAI ---
@@ -109,7 +180,7 @@ sentiment_analyst = Agent(
     goal='Analisar o sentimento do texto fornecido e fornecer um resumo formatado em JSON.',
     backstory='Você é um especialista em processamento de linguagem natural com foco em análise de sentimento. Você identifica com precisão o tom emocional em textos e retorna os resultados em JSON.',
     llm=llm,
-    verbose=True,
+    verbose=VERBOSE,
     allow_delegation=False
 )
 
@@ -118,7 +189,7 @@ report_writer = Agent(
     role='Escritor de Relatórios',
     goal='Criar um pequeno relatório baseado na análise de sentimento fornecida.',
     backstory='Você transforma dados analíticos em relatórios claros e compreensíveis para stakeholders.',
-    verbose=True,
+    verbose=VERBOSE,
     llm=llm,
     allow_delegation=False
 )
@@ -144,27 +215,35 @@ crew = Crew(
     agents=[sentiment_analyst, report_writer],
     tasks=[analysis_task, report_task],
     process=Process.sequential,
-    verbose=True
+    verbose=VERBOSE
 )
 
 # --- Execução ---
-if __name__ == "__main__":
+async def main():
     text_to_analyze = "Adorei o novo celular! A câmera é incrível e a bateria dura muito. No entanto, achei o preço um pouco elevado."
-    inputs = {'text_input': text_to_analyze}
+    inputs = {'text_input': truncate_text(text_to_analyze)}
 
-    print(f"--- Iniciando a CrewAI (Nível 2 com Guardrails Explícito) ---")
+    logger.info("--- Iniciando a CrewAI (Nível 2 com Guardrails Explícito) ---")
     try:
-        result = crew.kickoff(inputs=inputs)
-        print("\n--- Execução da CrewAI Concluída ---")
-        print("\n--- Saída Final da Crew (Relatório) ---")
+        # O callback de validação é síncrono (a CrewAI não aguarda callbacks
+        # assíncronos) e precisa terminar antes da report_task, que usa a análise
+        # validada como contexto. Com o kickoff assíncrono a crew inteira, incluindo
+        # o callback, roda em uma thread de trabalho e não bloqueia o event loop.
+        result = await crew.kickoff_async(inputs=inputs)
+        logger.info("\n--- Execução da CrewAI Concluída ---")
+        logger.info("\n--- Saída Final da Crew (Relatório) ---")
         # Verifica se result não é None antes de acessar .raw
         if result and hasattr(result, 'raw'):
-             print(result.raw)
+             logger.info("%s", result.raw)
         else:
-             print("A execução da crew não produziu uma saída final.")
+             logger.info("A execução da crew não produziu uma saída final.")
 
     except Exception as e:
-        print(f"\n--- Erro durante a execução da CrewAI (Provavelmente da validação) ---")
+        logger.error("\n--- Erro durante a execução da CrewAI (Provavelmente da validação) ---")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -10,9 +10,12 @@ corretivo para o LLM.
 import os
 from dotenv import load_dotenv
 import sys
+import asyncio
+import threading
+from functools import lru_cache
 from typing import Optional, Union
 import warnings
-import json
+from collections import OrderedDict
 
 # --- Imports Pydantic ---
 from pydantic import BaseModel, Field, ValidationError as PydanticValidationError
@@ -21,6 +24,10 @@ from pydantic import BaseModel, Field, ValidationError as PydanticValidationErro
 from crewai import Crew, Process, Agent, Task, LLM
 from crewai.tasks.task_output import TaskOutput
 
+# --- Imports do LiteLLM (camada usada pelo LLM da CrewAI) ---
+import litellm
+from litellm.caching import Cache
+
 # --- Imports do Guardrails AI ---
 from guardrails import Guard
 from guardrails.hub import ValidChoices
@@ -29,8 +36,15 @@ from guardrails.classes.validation.validation_result import FailResult
 # Suprimir o DeprecationWarning específico do asyncio no Guardrails
 warnings.filterwarnings("ignore", message="There is no current event loop", category=DeprecationWarning)
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Carregar variáveis de ambiente do arquivo .env (uma vez por árvore de processos; ver README)
+if not os.environ.get("CREWAI_GUARDRAILS_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["CREWAI_GUARDRAILS_DOTENV_LOADED"] = "1"
+
+# --- Cache de Respostas do LLM ---
+# Cache em disco, desligado por padrão (LLM_CACHE=1 liga; ver README)
+if os.getenv("LLM_CACHE", "0") == "1":
+    litellm.cache = Cache(type="disk", disk_cache_dir=".llm_cache")
 
 # --- Configuração do LLM ---
 try:
@@ -43,18 +57,30 @@ except Exception as e:
     sys.exit(1)
 
 # --- Definição do Modelo Pydantic com Validador Guardrails ---
+# Remover 'negativo' temporariamente para forçar o reask
+SENTIMENT_CHOICES = ['positivo', 'negativo', 'neutro']
+#SENTIMENT_CHOICES = ['positivo', 'neutro']
+_ALLOWED_SENTIMENTS = frozenset(SENTIMENT_CHOICES)
+
 class SentimentAnalysis(BaseModel):
     sentiment: str = Field(
         description="O sentimento geral do texto (positivo, negativo ou neutro)",
         validators=[
-            # Remover 'negativo' temporariamente para forçar o reask
-            ValidChoices(choices=['positivo', 'negativo', 'neutro'], on_fail="reask")
-            #ValidChoices(choices=['positivo', 'neutro'], on_fail="reask")
+            ValidChoices(choices=SENTIMENT_CHOICES, on_fail="reask")
         ]
     )
     summary: str = Field(description="Um breve resumo justificando a análise de sentimento.")
     confidence_score: Optional[float] = Field(None, ge=0.0, le=1.0, description="Score de confiança da análise (0.0 a 1.0), se aplicável.")
 
+@lru_cache(maxsize=16)
+def get_pydantic_guard(output_class: type[BaseModel]) -> Guard:
+    """
+    Retorna o Guard gerado a partir do modelo Pydantic `output_class`.
+    O schema e os validadores do modelo não mudam em tempo de execução, então o
+    Guard é construído uma única vez por modelo, e não a cada execução do callback.
+    """
+    return Guard.for_pydantic(output_class=output_class)
+
 # --- Função Callback com Guardrails AI ---
 def validate_sentiment_analysis_with_reask(output: TaskOutput):
     """
@@ -72,8 +98,20 @@ def validate_sentiment_analysis_with_reask(output: TaskOutput):
     # Log inicial da saída bruta
     print(f"Saída Bruta Recebida:\n'''\n{raw_output_str}\n'''")
 
-    # Configurar o Guardrails
-    guard = Guard.for_pydantic(output_class=SentimentAnalysis)
+    # Caminho rápido: o pydantic-core (Rust) faz o parse e a validação do schema
+    # em uma única passada, e o ValidChoices vira um simples teste de pertinência
+    try:
+        analysis = SentimentAnalysis.model_validate_json(raw_output_str)
+    except PydanticValidationError:
+        analysis = None # Ex.: JSON dentro de ```json``` ou campos inválidos
+    if analysis is not None and analysis.sentiment in _ALLOWED_SENTIMENTS:
+        print("--- Validação bem-sucedida! ---")
+        print("Dados Validados:", analysis.model_dump())
+        return
+
+    # Fora do caminho rápido, o Guard faz a extração e gera a sugestão de reask
+    # Guard compartilhado entre execuções do callback
+    guard = get_pydantic_guard(SentimentAnalysis)
 
     try:
         # Tentar extrair e validar a saída bruta
@@ -103,7 +141,7 @@ def validate_sentiment_analysis_with_reask(output: TaskOutput):
              raise ValueError("Guardrails retornou sucesso mas sem dados validados.")
 
     # Captura erros específicos ou gerais que podem ocorrer
-    except (PydanticValidationError, json.JSONDecodeError) as val_err:
+    except PydanticValidationError as val_err:
          print(f"--- Falha no Callback: Erro de Validação/Parsing ---")
          print(f"Erro: {type(val_err).__name__}: {val_err}")
          raise val_err # Propaga o erro para parar a crew
@@ -153,6 +191,101 @@ crew = Crew(
     verbose=True
 )
 
+# --- Validação de Entrada ---
+# Checagem estrutural barata, feita antes do kickoff: textos vazios ou grandes
+# demais são recusados sem gastar a chamada ao LLM.
+MAX_TEXT_CHARS = 8000
+
+def check_text_input(text: str) -> None:
+    """Lança ValueError se `text` estiver vazio ou tiver mais de MAX_TEXT_CHARS caracteres."""
+    if not text or not text.strip():
+        raise ValueError("O texto de entrada está vazio.")
+    if len(text) > MAX_TEXT_CHARS:
+        raise ValueError(f"O texto de entrada tem {len(text)} caracteres; o limite é {MAX_TEXT_CHARS}.")
+
+# --- Cache de Resultados por Texto ---
+# Textos repetidos (ignorando maiúsculas e espaços) reaproveitam a análise já
+# validada e o relatório, sem nova execução da crew. Só textos equivalentes
+# compartilham resultado: paráfrases próximas podem ter sentimentos opostos.
+MAX_CACHED_RESULTS = 256
+_result_cache: "OrderedDict[str, tuple[str, str]]" = OrderedDict()
+# analyze_text pode ser chamada de várias threads ao mesmo tempo
+_result_cache_lock = threading.Lock()
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def _get_cached_result(key: str) -> Optional[tuple[str, str]]:
+    with _result_cache_lock:
+        cached = _result_cache.get(key)
+        if cached is not None:
+            _result_cache.move_to_end(key)
+        return cached
+
+def _store_result(key: str, entry: tuple[str, str]) -> None:
+    with _result_cache_lock:
+        _result_cache[key] = entry
+        _result_cache.move_to_end(key)
+        if len(_result_cache) > MAX_CACHED_RESULTS:
+            _result_cache.popitem(last=False) # Remove o usado há mais tempo
+
+def analyze_text(text: str) -> tuple[str, str]:
+    """
+    Executa a crew para `text` e retorna (JSON da análise validada, relatório).
+    Os resultados mais recentes (até MAX_CACHED_RESULTS) ficam em memória.
+    """
+    check_text_input(text)
+    key = _normalize_text(text)
+    cached = _get_cached_result(key)
+    if cached is not None:
+        return cached
+
+    result = crew.kickoff(inputs={'text_input': text})
+    entry = (result.tasks_output[0].raw, result.raw)
+    _store_result(key, entry)
+    return entry
+
+# --- Execução em Lote ---
+# Limite de kickoffs simultâneos (ver README)
+MAX_CONCURRENT_KICKOFFS = 32
+
+async def run_batch(texts: list[str]) -> list[Union[tuple[str, str], Exception]]:
+    """
+    Analisa o sentimento de vários textos em paralelo.
+    Passa pelo mesmo cache do analyze_text: textos já analisados não executam a
+    crew, e textos equivalentes repetidos no lote executam uma única vez. Os
+    demais rodam cada um em uma cópia da crew (como no kickoff_for_each_async),
+    com no máximo MAX_CONCURRENT_KICKOFFS execuções simultâneas. O callback de
+    validação roda na thread de trabalho de cada kickoff, sem bloquear o event loop.
+    Retorna a lista de resultados na mesma ordem de `texts`: o par (JSON da análise
+    validada, relatório) de cada texto, ou a exceção que o fez falhar, seja o
+    ValueError da validação de entrada (sem kickoff) ou o erro da validação da
+    saída. Um texto com erro não descarta os demais.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_KICKOFFS)
+
+    async def _analyze(key: str, text: str) -> tuple[str, str]:
+        check_text_input(text)
+        cached = _get_cached_result(key)
+        if cached is not None:
+            return cached
+        async with semaphore:
+            result = await crew.copy().kickoff_async(inputs={'text_input': text})
+        entry = (result.tasks_output[0].raw, result.raw)
+        _store_result(key, entry)
+        return entry
+
+    # Uma execução por texto normalizado; as repetições recebem o mesmo resultado
+    unique_texts: dict[str, str] = {}
+    for text in texts:
+        unique_texts.setdefault(_normalize_text(text), text)
+    entries = await asyncio.gather(
+        *[_analyze(key, text) for key, text in unique_texts.items()],
+        return_exceptions=True,
+    )
+    results = dict(zip(unique_texts, entries))
+    return [results[_normalize_text(text)] for text in texts]
+
 # --- Execução ---
 if __name__ == "__main__":
     # Teste 1: Deve passar na validação
@@ -165,19 +298,17 @@ if __name__ == "__main__":
     # Escolha qual texto testar
     text_to_analyze = text_to_analyze_reask # Ou _reask ou _fail_json
 
-    inputs = {'text_input': text_to_analyze}
-
     print(f"--- Iniciando a CrewAI (Nível 3 com Guardrails 'reask' no Pydantic - Corrigido) ---")
     try:
-        result = crew.kickoff(inputs=inputs)
+        analysis_raw, report = analyze_text(text_to_analyze)
         print("\n--- Execução da CrewAI Concluída (Validação passou) ---")
 
         print("\n--- Saída Bruta da Tarefa de Análise (JSON String) ---")
-        print(analysis_task.output.raw if analysis_task.output else "N/A")
+        print(analysis_raw or "N/A")
 
         print("\n--- Saída Final da Crew (Relatório) ---")
-        if result and hasattr(result, 'raw'):
-             print(result.raw)
+        if report:
+             print(report)
         else:
              print("A execução da crew não produziu uma saída final.")
 
@@ -4,33 +4,40 @@ Nível 3: Guardrails 'reask' com Validador do Hub (DetectJailbreak).
 Este exemplo usa o validador DetectJailbreak do Guardrails Hub dentro de
 um callback do CrewAI para verificar se a saída de um agente chatbot
 contém uma tentativa de jailbreak. O on_fail está configurado para 'reask'.
+O mesmo validador também faz a triagem do prompt de entrada (screen_prompt)
+antes do kickoff e a verificação incremental da resposta em streaming.
 
 O que Esperar:
 
 Com safe_prompt:
 
+- screen_prompt verifica o prompt antes do kickoff e o aprova.
 - O LLM deve gerar uma resposta normal sobre relatividade.
+- A verificação incremental do streaming não encontra jailbreak.
 - O callback validate_jailbreak_attempt será chamado.
 - DetectJailbreak deve retornar validation_passed=True.
 - O callback imprimirá a mensagem de sucesso.
 - A Crew terminará com sucesso, mostrando a explicação sobre relatividade.
 
-Com jailbreak_prompt:
+Com jailbreak_prompt (padrão em current_prompt):
 
-- O LLM pode tentar responder à instrução maliciosa (dependendo da robustez do próprio LLM base). Modelos como GPT-4o ou Gemini mais recentes provavelmente se recusarão intrinsecamente. Se o LLM se recusar, a validação passará (pois a recusa não é um jailbreak).
-- Se o LLM gerar uma resposta que o DetectJailbreak considere uma tentativa de jailbreak:
-- O callback será chamado.
-- DetectJailbreak retornará validation_passed=False.
-- Como on_fail="reask", o validation_outcome.reask não será None.
-- O callback imprimirá "--- Validação Guardrails Falhou (Reask sugerido - Jailbreak detectado) ---".
-- O ValueError será lançado.
-- A execução da Crew será interrompida com o erro.
+- screen_prompt deve classificar o próprio prompt como tentativa de jailbreak, antes do kickoff.
+- O script imprime "--- Prompt Bloqueado pela Validação de Entrada (Jailbreak detectado) ---" e termina com erro, sem executar a crew nem chamar o LLM.
+
+Se um prompt passar pela triagem de entrada e ainda assim a resposta for classificada como jailbreak:
+
+- Durante o streaming: a geração é interrompida, a resposta parcial é descartada e o script imprime "--- Resposta Interrompida pela Verificação Incremental (Jailbreak detectado) ---".
+- Na resposta final: o callback recebe validation_passed=False com on_fail="reask" (validation_outcome.reask não é None), imprime "--- Validação Guardrails Falhou (Reask sugerido - Jailbreak detectado) ---" e lança ValueError, interrompendo a execução da Crew.
 
 """
 
 import os
 from dotenv import load_dotenv
 import sys
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional, Union
 import warnings
 import json
@@ -38,6 +45,12 @@ import json
 # --- Imports do CrewAI ---
 from crewai import Crew, Process, Agent, Task, LLM
 from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.events import crewai_event_bus
+from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMStreamChunkEvent
+
+# --- Imports do LiteLLM (camada usada pelo LLM da CrewAI) ---
+import litellm
+from litellm.caching import Cache
 
 # --- Imports do Guardrails AI ---
 from guardrails import Guard
@@ -49,11 +62,148 @@ from guardrails.errors import ValidationError # Capturar erros de validação
 warnings.filterwarnings("ignore", message="There is no current event loop", category=DeprecationWarning)
 warnings.filterwarnings("ignore", message="Using Pydantic V1 type checking", category=RuntimeWarning)
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Carregar variáveis de ambiente do arquivo .env (uma vez por árvore de processos; ver README)
+if not os.environ.get("CREWAI_GUARDRAILS_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["CREWAI_GUARDRAILS_DOTENV_LOADED"] = "1"
+
+# --- Cache de Respostas do LLM ---
+# Cache em disco, desligado por padrão (LLM_CACHE=1 liga; ver README)
+if os.getenv("LLM_CACHE", "0") == "1":
+    litellm.cache = Cache(type="disk", disk_cache_dir=".llm_cache")
 
-llm = LLM(model='gemini/gemini-2.0-flash-001') # Ou 'openai/gpt-4o-mini' se preferir OpenAI
+# A resposta chega em streaming, para que a verificação incremental abaixo possa
+# interromper a geração assim que um jailbreak for detectado
+llm = LLM(model='gemini/gemini-2.0-flash-001', stream=True) # Ou 'openai/gpt-4o-mini' se preferir OpenAI
 
+def _jailbreak_device() -> str:
+    """
+    Dispositivo do classificador do DetectJailbreak: DETECT_JAILBREAK_DEVICE se
+    definido (ex.: 'cpu', 'cuda', 'cuda:1'), senão 'cuda' quando houver GPU.
+    """
+    device = os.getenv("DETECT_JAILBREAK_DEVICE")
+    if device:
+        return device
+    try:
+        import torch # Já instalado como dependência do validador
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+@lru_cache(maxsize=1)
+def get_jailbreak_guard() -> Guard:
+    """
+    Retorna o Guard com DetectJailbreak.
+    O validador carrega um modelo classificador; construir o Guard uma única vez
+    evita recarregar o modelo a cada execução do callback. O mesmo Guard (e,
+    portanto, o mesmo modelo em memória) verifica o prompt de entrada, o texto em
+    streaming e a resposta final.
+    """
+    # Passando on_fail diretamente no construtor do validador.
+    # Os validadores deste Guard síncrono rodam em sequência: nas threads de trabalho
+    # da crew (kickoff_async, run_batch) e dentro de um event loop já ativo o
+    # Guardrails não consegue um loop próprio e usa a validação sequencial. Com um único validador, use_many equivale a use;
+    # se validadores extras (PII, toxicidade...) precisarem rodar em paralelo, o
+    # caminho é um AsyncGuard aguardado com await.
+    return Guard().use_many(
+        DetectJailbreak(on_fail="reask", device=_jailbreak_device()),
+    )
+
+def screen_prompt(prompt: str) -> None:
+    """
+    Verifica o prompt do usuário ANTES do kickoff.
+    Um prompt de jailbreak é barrado sem gastar a chamada ao LLM; a validação
+    da resposta no callback continua como segunda barreira.
+    Lança ValidationError se o prompt for classificado como tentativa de jailbreak.
+    """
+    validation_outcome = get_jailbreak_guard().validate(prompt)
+    if not validation_outcome.validation_passed:
+        raise ValidationError(f"Prompt de entrada classificado como tentativa de jailbreak. Erro: {validation_outcome.error}")
+
+# --- Verificação Incremental Durante o Streaming ---
+# A cada STREAM_CHECK_CHARS novos caracteres da resposta, o DetectJailbreak roda
+# sobre o texto acumulado em uma thread à parte (_STREAM_CHECK_EXECUTOR), para não
+# segurar a entrega dos tokens enquanto o classificador roda. Quando uma dessas
+# verificações classifica o texto como jailbreak, o próximo chunk interrompe a
+# geração e o restante da resposta não é pago.
+STREAM_CHECK_CHARS = 400
+# Um único worker: as inferências do classificador rodam em sequência, sem várias
+# crews do run_batch disputando o mesmo modelo (e a mesma CPU/GPU)
+_STREAM_CHECK_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jailbreak-stream-check")
+# Estado da execução corrente (texto recebido, verificação pendente, detecção). A
+# ContextVar separa as execuções paralelas do run_batch; o estado é um objeto
+# mutável criado por kickoff_with_stream_check, que o lê de volta após o kickoff.
+_stream_state: contextvars.ContextVar[dict | None] = contextvars.ContextVar("stream_state", default=None)
+
+class JailbreakDetectedInStream(Exception):
+    """Lançada por kickoff_with_stream_check quando o texto em streaming foi classificado como jailbreak."""
+
+def _stream_check(answer: str) -> Optional[str]:
+    """Roda o DetectJailbreak sobre `answer`; retorna o erro se for jailbreak, senão None."""
+    try:
+        validation_outcome = get_jailbreak_guard().validate(answer)
+    except Exception as e:
+        # Falha do classificador não interrompe a resposta: o callback ainda valida o texto final
+        print(f"[Aviso] Verificação incremental falhou: {type(e).__name__}: {e}")
+        return None
+    return None if validation_outcome.validation_passed else str(validation_outcome.error)
+
+def _reset_stream_buffer(source, event):
+    state = _stream_state.get()
+    if state is not None:
+        state["buffer"] = ""
+        state["checked_chars"] = 0
+
+def _check_streamed_answer(source, event):
+    state = _stream_state.get()
+    if state is None or state["error"] is not None:
+        return
+    state["buffer"] += event.chunk
+
+    # Resultado de uma verificação anterior, se já terminou (sem esperar por ela)
+    pending = state["pending"]
+    if pending is not None and pending.done():
+        state["pending"] = None
+        state["error"] = pending.result()
+        if state["error"] is not None:
+            # A exceção só interrompe o streaming: a CrewAI a captura dentro do LLM e
+            # segue com o texto parcial. Quem chamou o kickoff descobre a detecção
+            # pelo estado (ver kickoff_with_stream_check).
+            raise JailbreakDetectedInStream(state["error"])
+
+    # Só verifica o texto após "Final Answer:"; antes disso vem o raciocínio do agente
+    _, marker, answer = state["buffer"].partition("Final Answer:")
+    if not marker or state["pending"] is not None or len(answer) - state["checked_chars"] < STREAM_CHECK_CHARS:
+        return
+    state["checked_chars"] = len(answer)
+    state["pending"] = _STREAM_CHECK_EXECUTOR.submit(_stream_check, answer)
+
+# Registra os listeners da verificação incremental
+crewai_event_bus.on(LLMCallStartedEvent)(_reset_stream_buffer)
+crewai_event_bus.on(LLMStreamChunkEvent)(_check_streamed_answer)
+
+def kickoff_with_stream_check(crew: Crew, inputs: dict):
+    """
+    Executa crew.kickoff com a verificação incremental ativa e retorna o CrewOutput.
+    Se o texto em streaming foi classificado como jailbreak, lança
+    JailbreakDetectedInStream em vez de devolver a resposta parcial como resultado.
+    """
+    state = {"buffer": "", "checked_chars": 0, "pending": None, "error": None}
+    _stream_state.set(state)
+    try:
+        result = crew.kickoff(inputs=inputs)
+    except Exception as e:
+        if state["error"] is not None:
+            raise JailbreakDetectedInStream(f"Jailbreak detectado durante o streaming; geração interrompida. Erro: {state['error']}") from e
+        raise
+    # Verificação que terminou depois do último chunk (sem esperar pelas pendentes:
+    # o callback já validou a resposta final completa)
+    pending = state["pending"]
+    if state["error"] is None and pending is not None and pending.done():
+        state["error"] = pending.result()
+    if state["error"] is not None:
+        raise JailbreakDetectedInStream(f"Jailbreak detectado durante o streaming; geração interrompida. Erro: {state['error']}")
+    return result
 
 # --- Função Callback com Guardrails AI (DetectJailbreak) ---
 def validate_jailbreak_attempt(output: TaskOutput):
@@ -68,10 +218,9 @@ def validate_jailbreak_attempt(output: TaskOutput):
         print("--- Aviso: Saída bruta da tarefa está vazia. Pulando validação. ---")
         return # Retorna sem validar se a saída for vazia
 
-    # Configurar o Guardrails com DetectJailbreak
-    # Passando on_fail diretamente no construtor do validador
+    # Guard com DetectJailbreak (construído na primeira chamada e reaproveitado)
     try:
-        guard = Guard().use(DetectJailbreak(on_fail="reask"))
+        guard = get_jailbreak_guard()
     except Exception as e:
         print(f"--- Erro ao inicializar Guard ou DetectJailbreak: {e} ---")
         print("Certifique-se de que o validador DetectJailbreak está instalado corretamente ('guardrails hub install hub://guardrails/detect_jailbreak')")
@@ -146,6 +295,40 @@ crew = Crew(
     verbose=True
 )
 
+# --- Execução em Lote ---
+# Limite de kickoffs simultâneos (ver README)
+MAX_CONCURRENT_KICKOFFS = 32
+
+async def run_batch(prompts: list[str]):
+    """
+    Responde a vários prompts de usuário em paralelo.
+    Cada entrada roda em uma cópia da crew (como no kickoff_for_each_async),
+    com no máximo MAX_CONCURRENT_KICKOFFS execuções simultâneas. O callback de
+    validação roda na thread de trabalho de cada kickoff, sem bloquear o event loop.
+    Retorna a lista de resultados na mesma ordem de `prompts`: o CrewOutput de cada
+    prompt, ou a exceção que o fez falhar. Prompts barrados pela validação de
+    entrada não executam a crew e recebem o ValidationError correspondente; falhas
+    na saída (JailbreakDetectedInStream, erro do callback) ficam no lugar do
+    prompt afetado, sem descartar os demais.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_KICKOFFS)
+
+    async def _kickoff(prompt: str):
+        async with semaphore:
+            # Cada prompt é triado na própria execução, logo antes do seu kickoff:
+            # um prompt aprovado não espera a triagem dos demais
+            try:
+                await asyncio.to_thread(screen_prompt, prompt)
+            except ValidationError as val_err:
+                return val_err
+            # Mesma thread de trabalho do kickoff_async, com a verificação incremental ativa
+            return await asyncio.to_thread(kickoff_with_stream_check, crew.copy(), {'user_prompt': prompt})
+
+    return await asyncio.gather(
+        *[_kickoff(prompt) for prompt in prompts],
+        return_exceptions=True,
+    )
+
 # --- Execução ---
 if __name__ == "__main__":
     # Prompt seguro
@@ -163,8 +346,18 @@ if __name__ == "__main__":
 
     print(f"--- Iniciando a CrewAI (Nível 3 com DetectJailbreak) ---")
     print(f"Prompt de entrada: {current_prompt}")
+
+    # Validação de entrada: barra o prompt antes de qualquer chamada ao LLM
     try:
-        result = crew.kickoff(inputs=inputs)
+        screen_prompt(current_prompt)
+    except ValidationError as val_err:
+        print("\n--- Prompt Bloqueado pela Validação de Entrada (Jailbreak detectado) ---")
+        print("A crew não foi executada.")
+        print(f"Erro: {val_err}")
+        sys.exit(1)
+
+    try:
+        result = kickoff_with_stream_check(crew, inputs)
         print("\n--- Execução da CrewAI Concluída (Validação passou) ---")
         print("\n--- Saída Final da Crew (Resposta do Chatbot) ---")
         if result and hasattr(result, 'raw'):
@@ -172,6 +365,11 @@ if __name__ == "__main__":
         else:
              print("A execução da crew não produziu uma saída final.")
 
+    except JailbreakDetectedInStream as e:
+        print("\n--- Resposta Interrompida pela Verificação Incremental (Jailbreak detectado) ---")
+        print("A resposta parcial foi descartada.")
+        print(f"Erro: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"\n--- Erro Capturado Durante a Execução da CrewAI ---")
         print(f"Ocorreu um erro, provavelmente devido à detecção de jailbreak pela validação.")
@@ -0,0 +1,6 @@
+"""
+Nível 5: Ferramenta Customizada + Guardrails em Callback com Pydantic.
+
+Pacote instalado com `pip install -e .` (em crewai_guard/), para que main.py e
+teste_tool.py importem crew_nv5.custom_tool sem ajustar o sys.path.
+"""
@@ -6,10 +6,21 @@ e retorna o texto bruto. A estruturação/validação será feita por uma tarefa
 do agente que usa esta ferramenta.
 """
 
+import atexit
+import codecs
+import logging
+import os
+import threading
+import time
 import warnings
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree, html as lxml_html
 from typing import Type, Optional, Any, Dict, Union
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 import re
 
 # --- Imports Pydantic ---
@@ -22,6 +33,119 @@ from crewai.tools import BaseTool
 warnings.filterwarnings("ignore", message="There is no current event loop", category=DeprecationWarning)
 warnings.filterwarnings("ignore", message="Using Pydantic V1 type checking", category=RuntimeWarning)
 
+logger = logging.getLogger(__name__)
+
+# Sequências de linhas vazias, compilado uma única vez no carregamento do módulo
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+# Tags ignoradas na extração do texto do conteúdo principal (comentários HTML e
+# processing instructions também, como o get_text do BeautifulSoup já os ignorava)
+_UNWANTED_TAGS = ('script', 'style', 'nav', 'footer', 'aside', 'header', 'form', 'button', 'iframe', 'img', etree.Comment, etree.PI)
+
+# Limite de bytes baixados por página: o texto extraído é truncado em 8000
+# caracteres de qualquer jeito, então o resto de páginas grandes não é transferido
+MAX_BYTES = 512 * 1024
+_CHUNK_SIZE = 64 * 1024
+
+# --- Sessão HTTP Compartilhada ---
+# Uma única sessão reaproveita as conexões (keep-alive) entre raspagens, sem novo
+# handshake TCP/TLS a cada chamada. Falhas transitórias são repetidas até 2 vezes.
+_SESSION = requests.Session()
+_SESSION.headers.update({'User-Agent': 'Mozilla/5.0'}) # requests já envia Accept-Encoding: gzip, deflate
+_ADAPTER = HTTPAdapter(pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.3))
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+atexit.register(_SESSION.close) # Fecha as conexões do pool ao encerrar o processo
+
+# --- Cache do Conteúdo Raspado ---
+# A mesma URL é raspada a cada execução (teste_tool.py, re-execuções da crew, listas
+# de URLs repetidas no run_batch). O texto extraído fica em disco (.scrape_cache/)
+# por SCRAPE_CACHE_TTL segundos. Desative com SCRAPE_CACHE=0.
+SCRAPE_CACHE_TTL = 60 * 60
+
+# Os textos mais recentes (até MAX_MEMORY_CACHED) ficam também em memória, na
+# frente do cache em disco: chamadas repetidas no mesmo processo não leem nem
+# desserializam o arquivo. Cada entrada expira junto com a do disco.
+MAX_MEMORY_CACHED = 128
+_memory_cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_memory_lock = threading.Lock() # As crews do run_batch rodam em threads diferentes
+
+# Parâmetros de rastreamento que não mudam o conteúdo da página
+_TRACKING_PARAMS = ('fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+@lru_cache(maxsize=1)
+def _get_scrape_cache():
+    """Retorna o cache em disco das raspagens, ou None se SCRAPE_CACHE=0."""
+    if os.getenv("SCRAPE_CACHE", "1") != "1":
+        return None
+    from diskcache import Cache
+    return Cache(".scrape_cache")
+
+def _normalize_url(url: str) -> str:
+    """Chave do cache: URL sem fragmento e sem parâmetros de rastreamento (utm_* etc.)."""
+    parts = urlsplit(url.strip())
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith('utm_') and key not in _TRACKING_PARAMS
+    ])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+
+def _known_encoding(name: Optional[str]) -> Optional[str]:
+    """
+    Retorna `name` se for uma codificação conhecida pelo Python, senão None.
+    Um charset inválido no cabeçalho (ex.: 'utf8mb4') faria o parser lançar
+    LookupError; com None o lxml usa o <meta charset> da página.
+    """
+    if not name:
+        return None
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+def _iter_text_pieces(root):
+    """
+    Percorre a subárvore de `root` em ordem de documento e gera cada .text/.tail
+    como um trecho separado, pulando as subárvores de _UNWANTED_TAGS (mas não o
+    tail delas, que é texto do elemento pai). Iterativo, sem limite de recursão
+    em páginas muito aninhadas.
+    """
+    if root.text:
+        yield root.text
+    stack = [(root, iter(root))]
+    while stack:
+        parent, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if stack and parent.tail: # O tail de `root` fica fora do conteúdo
+                yield parent.tail
+            continue
+        if child.tag in _UNWANTED_TAGS:
+            if child.tail:
+                yield child.tail
+            continue
+        if child.text:
+            yield child.text
+        stack.append((child, iter(child)))
+
+
+def _find_main_content(tree):
+    """
+    Retorna o primeiro <main> do documento; se não houver, o primeiro <article>;
+    senão o <body>. Uma única passada pela árvore, em vez de uma busca por tag.
+    """
+    article = None
+    for element in tree.iter('main', 'article'):
+        if element.tag == 'main':
+            return element
+        if article is None:
+            article = element
+    if article is not None:
+        return article
+    return tree.find('body') # Filho direto de <html>, sem percorrer o documento
 
 # --- Modelo Pydantic para o Input da Ferramenta ---
 class WebsiteInputSchema(BaseModel):
@@ -43,35 +167,94 @@ class WebsiteContentScraperTool(BaseTool):
         Executa a lógica da ferramenta: raspa a web e retorna o texto bruto.
         Retorna o texto raspado ou uma string de erro.
         """
-        print(f"\n--- [Tool._run] Executando scraping para: {website_url} ---")
+        cache = _get_scrape_cache()
+        if cache is None:
+            return self._scrape(website_url)
+
+        key = _normalize_url(website_url)
+        with _memory_lock:
+            entry = _memory_cache.get(key)
+            if entry is not None and entry[0] > time.time():
+                _memory_cache.move_to_end(key)
+                return entry[1]
+
+        raw_content, expires_at = cache.get(key, expire_time=True)
+        if raw_content is not None:
+            logger.info("[Tool Info] Conteúdo de %s lido do cache (%s caracteres).", website_url, len(raw_content))
+        else:
+            raw_content = self._scrape(website_url)
+            # Erros (rede, página sem conteúdo) não vão para o cache: a próxima
+            # execução tenta de novo
+            if raw_content.startswith('[Tool Error]'):
+                return raw_content
+            cache.set(key, raw_content, expire=SCRAPE_CACHE_TTL)
+            expires_at = time.time() + SCRAPE_CACHE_TTL
+
+        with _memory_lock:
+            _memory_cache[key] = (expires_at, raw_content)
+            _memory_cache.move_to_end(key)
+            if len(_memory_cache) > MAX_MEMORY_CACHED:
+                _memory_cache.popitem(last=False) # Remove o usado há mais tempo
+        return raw_content
+
+    def invalidate(self, website_url: str) -> None:
+        """Descarta o conteúdo em cache de `website_url` (memória e disco); a próxima chamada raspa de novo."""
+        key = _normalize_url(website_url)
+        with _memory_lock:
+            _memory_cache.pop(key, None)
+        cache = _get_scrape_cache()
+        if cache is not None:
+            cache.delete(key)
+
+    def _scrape(self, website_url: str) -> str:
+        """Raspa a URL e retorna o texto bruto ou uma string de erro (sem cache)."""
+        logger.info("\n--- [Tool._run] Executando scraping para: %s ---", website_url)
 
         # 1. Scraping
         try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(website_url, headers=headers, timeout=15)
-            response.raise_for_status() # Lança erro para status HTTP ruins
+            with _SESSION.get(website_url, timeout=15, stream=True) as response:
+                response.raise_for_status() # Lança erro para status HTTP ruins
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+                # Lê o corpo em blocos e interrompe a transferência ao atingir MAX_BYTES
+                body = bytearray()
+                for chunk in response.iter_content(_CHUNK_SIZE):
+                    body += chunk
+                    if len(body) >= MAX_BYTES:
+                        break
 
-            # Tentativa de obter conteúdo principal
-            main_content = soup.find('main') or soup.find('article') or soup.find('body')
+                # Codificação declarada no cabeçalho HTTP, se houver; sem ela o lxml
+                # usa a declarada na própria página (<meta charset>)
+                has_charset = 'charset=' in response.headers.get('Content-Type', '').lower()
+                encoding = _known_encoding(response.encoding) if has_charset else None
 
-            if main_content:
-                 # Remover tags indesejadas
-                 for tag in main_content(['script', 'style', 'nav', 'footer', 'aside', 'header', 'form', 'button', 'iframe', 'img']):
-                     tag.decompose()
+            # lxml.html direto (C, sem a camada Python do BeautifulSoup); os bytes vão
+            # direto para o parser, sem decodificar e recodificar o texto
+            try:
+                parser = lxml_html.HTMLParser(encoding=encoding)
+            except LookupError:
+                # Nome aceito pelo Python, mas desconhecido pelo libxml2
+                parser = lxml_html.HTMLParser(encoding=None)
+            tree = lxml_html.document_fromstring(bytes(body[:MAX_BYTES]), parser=parser)
+
+            # Tentativa de obter conteúdo principal
+            main_content = _find_main_content(tree)
 
-                 # Obter texto, remover linhas vazias excessivas e limitar tamanho
-                 raw_content = main_content.get_text(separator='\n', strip=True)
+            if main_content is not None:
+                 # Obter texto sem as tags indesejadas, remover linhas vazias excessivas e
+                 # limitar tamanho. Cada trecho de texto vira uma linha, como no antigo
+                 # decompose() + get_text(separator='\n', strip=True): o texto antes e
+                 # depois de uma tag ignorada não é colado em uma palavra só
+                 raw_content = '\n'.join(filter(None, (text.strip() for text in _iter_text_pieces(main_content))))
                  # Limpar múltiplas linhas vazias
-                 raw_content = re.sub(r'\n\s*\n', '\n\n', raw_content)
+                 raw_content = _BLANK_LINES_RE.sub('\n\n', raw_content)
 
                  max_chars = 8000 # Aumentar um pouco o limite se necessário
                  if len(raw_content) > max_chars:
-                     print(f"[Tool Warning] Conteúdo raspado truncado para {max_chars} caracteres.")
+                     logger.warning("[Tool Warning] Conteúdo raspado truncado para %s caracteres.", max_chars)
                      raw_content = raw_content[:max_chars]
 
-                 print(f"[Tool Info] Scraping concluído. {len(raw_content)} caracteres extraídos (início):\n'''\n{raw_content[:300]}...\n'''")
+                 logger.info("[Tool Info] Scraping concluído. %s caracteres extraídos.", len(raw_content))
+                 logger.debug("Início do conteúdo raspado:\n'''\n%s...\n'''", raw_content[:300])
 
                  if len(raw_content.strip()) < 50: # Verificar conteúdo mínimo
                       return f"[Tool Error] Conteúdo significativo não encontrado ou muito curto em {website_url}"
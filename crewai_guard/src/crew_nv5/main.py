@@ -9,15 +9,16 @@ Este exemplo demonstra:
 """
 
 import os
+import json
+import logging
 from dotenv import load_dotenv
 import sys
+import asyncio
+import random
+from functools import lru_cache
 from typing import Optional, Union, Type, Dict, List
 import warnings
-import json
-import pprint
-
-# Adicionar o diretório src ao path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import re
 
 # --- Imports Pydantic ---
 # Mover a definição do modelo Pydantic para cá ou importar
@@ -27,18 +28,30 @@ from pydantic import BaseModel, Field, ValidationError as PydanticValidationErro
 # --- Imports do CrewAI ---
 from crewai import Crew, Process, Agent, Task, LLM
 from crewai.tasks.task_output import TaskOutput
+from crewai.tools import BaseTool
+
+# --- Imports do LiteLLM (erros do provedor repassados pelo LLM da CrewAI) ---
+import litellm
 
 # --- Imports do Guardrails AI ---
 from guardrails import Guard
 from guardrails.errors import ValidationError as GuardrailsValidationError
 
+# --- Logging ---
+# Mensagens via logging com argumentos preguiçosos (%s): o texto só é formatado
+# se o nível estiver habilitado, então os dumps de depuração não custam nada
+# quando várias crews rodam em lote.
+logger = logging.getLogger(__name__)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
 # --- Import da Ferramenta Customizada ---
-# Ajuste o path se necessário
+# crew_nv5 é um pacote instalado (pip install -e .), sem ajuste de sys.path
 try:
     from crew_nv5.custom_tool import WebsiteContentScraperTool
 except ImportError:
-    print("Erro: Não foi possível importar WebsiteContentScraperTool.")
-    print("Verifique se custom_tool.py está no diretório correto (crew_nv5) e se não há erros de sintaxe nele.")
+    logger.error("Erro: Não foi possível importar WebsiteContentScraperTool.")
+    logger.info("Verifique se o pacote foi instalado (pip install -e . em crewai_guard/) e se não há erros de sintaxe em custom_tool.py.")
     sys.exit(1)
 
 
@@ -46,8 +59,10 @@ except ImportError:
 warnings.filterwarnings("ignore", message="There is no current event loop", category=DeprecationWarning)
 warnings.filterwarnings("ignore", message="Using Pydantic V1 type checking", category=RuntimeWarning)
 
-# Carregar variáveis de ambiente
-load_dotenv() # Ajuste o path se necessário
+# Carregar variáveis de ambiente (uma vez por árvore de processos; ver README)
+if not os.environ.get("CREWAI_GUARDRAILS_DOTENV_LOADED"):
+    load_dotenv() # Ajuste o path se necessário
+    os.environ["CREWAI_GUARDRAILS_DOTENV_LOADED"] = "1"
 
 
 # --- Modelo Pydantic para a Saída Estruturada Esperada ---
@@ -56,174 +71,283 @@ class ExtractedWebData(BaseModel):
     title: str = Field(description="O título principal da página web.")
     summary: str = Field(description="Um breve resumo do conteúdo principal da página (máximo 2-3 frases).")
 
+# Schema JSON do modelo, embutido no prompt da tarefa de estruturação. Com o
+# formato exato (e sem cerca de código) no prompt, a resposta costuma passar
+# direto no caminho rápido do callback, sem limpeza de texto nem Guard.
+EXTRACTED_WEB_DATA_SCHEMA = json.dumps(ExtractedWebData.model_json_schema(), ensure_ascii=False)
 
-# --- Configuração do LLM ---
-try:
+@lru_cache(maxsize=1)
+def get_extracted_data_guard() -> Guard:
+    """
+    Retorna o Guard gerado a partir de ExtractedWebData.
+    Construído uma única vez, e não a cada execução do callback.
+    """
+    return Guard.for_pydantic(output_class=ExtractedWebData)
+
+
+# --- LLM e Ferramenta (construídos sob demanda) ---
+@lru_cache(maxsize=1)
+def get_llm() -> LLM:
+    """
+    Retorna o LLM compartilhado pelos dois agentes, criado na primeira chamada.
+    Importar o módulo (ou rodar só o teste_tool.py) não instancia o cliente.
+    """
     # Usaremos o mesmo LLM para ambos os agentes por simplicidade
     # llm = LLM(model='gemini/gemini-1.5-flash-latest')
     llm = LLM(model='gemini/gemini-2.0-flash-001')
-    print(f"Usando LLM: {llm.model}")
-except Exception as e:
-    print(f"Erro ao inicializar o LLM: {e}")
-    print("Verifique suas variáveis de ambiente.")
-    sys.exit(1)
+    logger.info("Usando LLM: %s", llm.model)
+    return llm
 
-# --- Instanciar Ferramenta Customizada ---
-try:
-    scraper_tool = WebsiteContentScraperTool() # Não precisa de LLM aqui
-except Exception as e:
-    print(f"Erro ao inicializar WebsiteContentScraperTool: {e}")
-    sys.exit(1)
+@lru_cache(maxsize=1)
+def get_scraper_tool() -> WebsiteContentScraperTool:
+    """Retorna a instância única da ferramenta de scraping (a sessão HTTP já é do módulo)."""
+    return WebsiteContentScraperTool() # Não precisa de LLM aqui
+
+# --- Extração do JSON da Saída do LLM ---
+# Cerca de código Markdown no início (```json) e no fim (```) da saída
+_FENCE_RE = re.compile(r'\A\s*```(?:json)?\s*|\s*```\s*\Z')
+
+def _strip_code_fence(text: str) -> str:
+    """Remove a cerca de código Markdown em volta do JSON, se houver."""
+    return _FENCE_RE.sub('', text).strip()
+
+def _validate_extracted_json(text: str) -> Optional[ExtractedWebData]:
+    """Valida `text` como ExtractedWebData; retorna None se não for um JSON válido para o modelo."""
+    try:
+        return ExtractedWebData.model_validate_json(text)
+    except PydanticValidationError:
+        return None
 
 # --- Função Callback com Guardrails AI (Pydantic) - CORRIGIDA ---
 def validate_extracted_data(output: TaskOutput):
     """
     Callback para validar a saída da tarefa de estruturação usando
     Guardrails AI for_pydantic, passando a string JSON bruta para parse.
+
+    Não levanta exceção: se a validação falhar, o erro é registrado no log e
+    output.pydantic fica None, sem abortar a crew (nem as demais URLs de um
+    run_batch). Quem lê o resultado decide o que fazer com a saída inválida.
     """
-    print("\n--- Executando Callback de Validação Guardrails (Pydantic) ---")
+    logger.info("\n--- Executando Callback de Validação Guardrails (Pydantic) ---")
     raw_output_str = output.raw
+    output.pydantic = None
 
     if not raw_output_str:
-        print("--- Aviso: Saída bruta da tarefa está vazia. Pulando validação. ---")
+        logger.warning("--- Aviso: Saída bruta da tarefa está vazia. Pulando validação. ---")
         return
 
-    # Preparar a string JSON para o Guardrails
-    # Remover marcadores comuns e whitespace extra
-    json_output_str = raw_output_str.strip().strip('```json').strip('```').strip()
-    print(f"String JSON extraída para validação:\n'''\n{json_output_str}\n'''")
-
-    # Verificar se a string parece minimamente com JSON (opcional, mas útil)
-    if not (json_output_str.startswith('{') and json_output_str.endswith('}')):
-         print(f"--- Falha Crítica: Saída bruta não parece ser um objeto JSON válido. ---")
-         raise ValueError("A saída da tarefa de estruturação não é um objeto JSON.")
-
+    # Caminho rápido: o Guard aqui só envolve o schema Pydantic, então o
+    # model_validate_json (pydantic-core, Rust) faz o mesmo parse + validação em
+    # uma única passada, sem montar um dict intermediário. No caso comum (JSON
+    # limpo) a saída bruta é validada direto, sem nenhuma limpeza de texto.
+    validated = _validate_extracted_json(raw_output_str)
+
+    if validated is None:
+        # Preparar a string JSON para o Guardrails
+        # Remover a cerca de código (```json ... ```) e whitespace extra
+        json_output_str = _strip_code_fence(raw_output_str)
+        logger.debug("String JSON extraída para validação:\n'''\n%s\n'''", json_output_str)
+
+        # Verificar se a string parece minimamente com JSON (opcional, mas útil)
+        if not (json_output_str.startswith('{') and json_output_str.endswith('}')):
+             logger.error("--- Falha Crítica: Saída bruta não parece ser um objeto JSON válido. ---")
+             return
+
+        validated = _validate_extracted_json(json_output_str)
+
+    if validated is not None:
+        logger.info("--- Validação (Pydantic) bem-sucedida! ---")
+        logger.info("Dados Validados: %r", validated)
+        # O modelo validado fica no próprio TaskOutput: quem lê o resultado da
+        # crew usa output.pydantic, sem parsear o JSON de novo
+        output.pydantic = validated
+        return
 
-    # Configurar o Guardrails
+    # O Guard abaixo gera o erro detalhado do Guardrails
     try:
-        guard = Guard.for_pydantic(output_class=ExtractedWebData)
-    except Exception as e:
-        print(f"--- Erro ao inicializar Guard.for_pydantic: {e} ---")
-        raise e
+        # Configurar o Guardrails
+        guard = get_extracted_data_guard()
 
-    try:
         # --- CORREÇÃO: Passar a string JSON para .parse() ---
         validation_outcome = guard.parse(json_output_str) # Passa a STRING JSON
 
-        print(f"Resultado da validação Guardrails (Pydantic): {validation_outcome}")
+        logger.debug("Resultado da validação Guardrails (Pydantic): %s", validation_outcome)
 
         if validation_outcome.validation_passed and validation_outcome.validated_output is not None:
-            print("--- Validação Guardrails (Pydantic) bem-sucedida! ---")
+            logger.info("--- Validação Guardrails (Pydantic) bem-sucedida! ---")
             validated_dict : dict = validation_outcome.validated_output
-            print("Dados Validados (dict):")
-            pprint.pprint(validated_dict) # Usar pprint
+            logger.info("Dados Validados (dict): %s", validated_dict)
             # Verificação opcional de consistência
             try:
-                ExtractedWebData(**validated_dict)
-                print("[INFO] Dict validado corresponde ao modelo ExtractedWebData.")
+                output.pydantic = ExtractedWebData(**validated_dict)
+                logger.info("[INFO] Dict validado corresponde ao modelo ExtractedWebData.")
             except PydanticValidationError as pyd_e:
-                 print(f"[AVISO] Dict validado NÃO corresponde ao modelo: {pyd_e}")
+                 logger.warning("[AVISO] Dict validado NÃO corresponde ao modelo: %s", pyd_e)
 
 
         elif not validation_outcome.validation_passed:
-             print("--- Validação Guardrails (Pydantic) Falhou ---")
-             print(f"Erro reportado pelo Guardrails: {validation_outcome.error}")
-             raise GuardrailsValidationError(f"Validação Pydantic falhou: {validation_outcome.error}")
+             logger.error("--- Validação Guardrails (Pydantic) Falhou ---")
+             logger.error("Erro reportado pelo Guardrails: %s", validation_outcome.error)
         else:
-             print("--- Validação Guardrails passou, mas sem dados validados (caso inesperado) ---")
-             raise ValueError("Guardrails retornou sucesso mas sem dados validados.")
+             logger.error("--- Validação Guardrails passou, mas sem dados validados (caso inesperado) ---")
 
     except GuardrailsValidationError as gr_val_err:
-        print(f"--- Falha na Validação Guardrails (Erro Capturado) ---")
-        print(f"Erro: {gr_val_err}")
-        raise gr_val_err
+        logger.error("--- Falha na Validação Guardrails (Erro Capturado) ---")
+        logger.error("Erro: %s", gr_val_err)
     except Exception as e:
-        print(f"--- Falha no Callback de Validação (Erro Geral) ---")
-        print(f"Erro: {type(e).__name__}: {e}")
-        raise e
+        logger.error("--- Falha no Callback de Validação (Erro Geral) ---")
+        logger.error("Erro: %s: %s", type(e).__name__, e)
 
 # --- Configuração da CrewAI ---
-
-# Agente 1: Extrator de Conteúdo Web
-web_extractor = Agent(
-    role='Extrator de Conteúdo Web',
-    goal='Raspar eficientemente o conteúdo de texto principal de uma página da web fornecida usando a ferramenta disponível.',
-    backstory='Você é um profissional focado em tarefas de scraping. Sua única função é usar a ferramenta WebsiteContentScraperTool para obter o texto de uma URL.',
-    tools=[scraper_tool], # Ferramenta customizada
-    llm=llm,
-    verbose=True,
-    allow_delegation=False
-)
-
-# Agente 2: Estruturador de Dados
-data_structurer = Agent(
-    role='Estruturador de Dados de Conteúdo',
-    goal='Analisar texto bruto de uma página web e extrair informações chave (título e resumo) em um formato JSON estruturado.',
-    backstory='Você é um especialista em processamento de linguagem natural. Você recebe texto bruto e sua tarefa é identificar o título principal e criar um resumo conciso, formatando a saída como um objeto JSON.',
-    llm=llm, # Usará este LLM para a tarefa de estruturação
-    verbose=True,
-    allow_delegation=False
-)
-
-# Tarefas
-scrape_content_task = Task(
-    description='Use a ferramenta WebsiteContentScraperTool para raspar o conteúdo principal da seguinte URL: {website_url}',
-    expected_output='O conteúdo de texto bruto completo da página web.',
-    agent=web_extractor
-    # Sem callback aqui, apenas retorna o texto bruto
+def build_crew(llm: LLM, scraper_tool: BaseTool) -> Crew:
+    """
+    Monta agentes, tarefas e a crew com o LLM e a ferramenta recebidos, o que
+    permite trocar qualquer um dos dois (por exemplo, em testes).
+    """
+    # Agente 1: Extrator de Conteúdo Web
+    web_extractor = Agent(
+        role='Extrator de Conteúdo Web',
+        goal='Raspar eficientemente o conteúdo de texto principal de uma página da web fornecida usando a ferramenta disponível.',
+        backstory='Você é um profissional focado em tarefas de scraping. Sua única função é usar a ferramenta WebsiteContentScraperTool para obter o texto de uma URL.',
+        tools=[scraper_tool], # Ferramenta customizada
+        llm=llm,
+        verbose=True,
+        allow_delegation=False
+    )
+
+    # Agente 2: Estruturador de Dados
+    data_structurer = Agent(
+        role='Estruturador de Dados de Conteúdo',
+        goal='Analisar texto bruto de uma página web e extrair informações chave (título e resumo) em um formato JSON estruturado.',
+        backstory='Você é um especialista em processamento de linguagem natural. Você recebe texto bruto e sua tarefa é identificar o título principal e criar um resumo conciso, formatando a saída como um objeto JSON.',
+        llm=llm, # Usará este LLM para a tarefa de estruturação
+        verbose=True,
+        allow_delegation=False
+    )
+
+    # Tarefas
+    scrape_content_task = Task(
+        description='Use a ferramenta WebsiteContentScraperTool para raspar o conteúdo principal da seguinte URL: {website_url}',
+        expected_output='O conteúdo de texto bruto completo da página web.',
+        agent=web_extractor
+        # Sem callback aqui, apenas retorna o texto bruto
+    )
+
+    structure_data_task = Task(
+        description=(
+            'Analise o texto bruto fornecido no contexto (resultado da tarefa anterior). '
+            'Identifique o título principal da página e crie um resumo conciso (2-3 frases) do conteúdo. '
+            'Formate sua resposta final como um único objeto JSON que siga exatamente este JSON Schema: '
+            + EXTRACTED_WEB_DATA_SCHEMA + ' '
+            'Responda APENAS com o objeto JSON, sem cerca de código (```) e sem texto antes ou depois.'
+        ),
+        expected_output='Um único objeto JSON válido segundo o schema, com as chaves "title" (string) e "summary" (string), sem cerca de código.',
+        context=[scrape_content_task], # Recebe o texto bruto da tarefa anterior
+        agent=data_structurer,
+        callback=validate_extracted_data # <<< Guardrails valida a saída JSON estruturada
+    )
+
+    # Criando a Crew (Sequencial é mais simples para este caso)
+    return Crew(
+        agents=[web_extractor, data_structurer],
+        tasks=[scrape_content_task, structure_data_task],
+        process=Process.sequential,
+        verbose=True
+    )
+
+@lru_cache(maxsize=1)
+def get_crew() -> Crew:
+    """Retorna a crew padrão, construída uma única vez com get_llm() e get_scraper_tool()."""
+    return build_crew(get_llm(), get_scraper_tool())
+
+# --- Execução em Lote ---
+# Limite de kickoffs simultâneos: cada execução faz uma requisição HTTP (scraping)
+# e chamadas ao LLM, então o limite protege o site e o rate limit do provedor
+MAX_PARALLEL = 8
+
+# Erros transitórios do provedor do LLM: a execução da URL é repetida até
+# MAX_ATTEMPTS vezes, com espera exponencial aleatória (limitada a RETRY_MAX_WAIT
+# segundos) entre as tentativas. O scraping repetido sai do cache da ferramenta.
+MAX_ATTEMPTS = 3
+RETRY_MAX_WAIT = 30
+_TRANSIENT_ERRORS = (
+    litellm.RateLimitError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+    litellm.APIConnectionError,
+    litellm.Timeout,
 )
 
-structure_data_task = Task(
-    description=(
-        'Analise o texto bruto fornecido no contexto (resultado da tarefa anterior). '
-        'Identifique o título principal da página e crie um resumo conciso (2-3 frases) do conteúdo. '
-        'Formate sua resposta final como um objeto JSON com as chaves "title" e "summary".'
-    ),
-    expected_output='Uma string contendo um único objeto JSON válido com as chaves "title" (string) e "summary" (string).',
-    context=[scrape_content_task], # Recebe o texto bruto da tarefa anterior
-    agent=data_structurer,
-    callback=validate_extracted_data # <<< Guardrails valida a saída JSON estruturada
-)
+async def run_batch(urls: list[str], concurrency: int = MAX_PARALLEL):
+    """
+    Raspa e estrutura várias URLs em paralelo.
+    Cada URL roda em uma cópia da crew (como no kickoff_for_each_async), com no
+    máximo `concurrency` execuções simultâneas: enquanto uma execução espera a
+    rede ou o LLM, as outras avançam.
+    Retorna a lista de resultados na mesma ordem de `urls`: o CrewOutput de cada
+    URL (com pydantic None se a validação falhou), ou a exceção que a fez falhar
+    (uma URL com erro não derruba o lote).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
 
-# Criando a Crew (Sequencial é mais simples para este caso)
-crew = Crew(
-    agents=[web_extractor, data_structurer],
-    tasks=[scrape_content_task, structure_data_task],
-    process=Process.sequential,
-    verbose=True
-)
+    async def _kickoff(url: str):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                async with semaphore:
+                    return await get_crew().copy().kickoff_async(inputs={'website_url': url})
+            except _TRANSIENT_ERRORS as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                # A espera acontece fora do semáforo, liberando a vaga para outra URL
+                delay = random.uniform(0, min(RETRY_MAX_WAIT, 2 ** attempt))
+                logger.warning("Erro transitório em %s (%s); nova tentativa em %.1fs.", url, type(e).__name__, delay)
+                await asyncio.sleep(delay)
+
+    return await asyncio.gather(*[_kickoff(url) for url in urls], return_exceptions=True)
 
 # --- Execução ---
-if __name__ == "__main__":
+async def main():
     # test_url = "https://www.guardrailsai.com/docs"
     test_url = "https://blog.crewai.com/enhancing-crewai-with-copilotkit-integration/"
 
     inputs = {'website_url': test_url}
 
-    print(f"--- Iniciando a CrewAI (Nível 5 - Ferramenta Custom + Guardrails Callback Pydantic) ---")
     try:
-        result = crew.kickoff(inputs=inputs)
-        print("\n--- Execução da CrewAI Concluída (Validação Final Passou) ---")
+        crew = get_crew()
+    except Exception as e:
+        logger.error("Erro ao inicializar o LLM ou a WebsiteContentScraperTool: %s", e)
+        logger.info("Verifique suas variáveis de ambiente.")
+        sys.exit(1)
 
-        print("\n--- Saída Bruta da Tarefa de Scraping ---")
-        print(scrape_content_task.output.raw if scrape_content_task.output else "N/A")
+    logger.info("--- Iniciando a CrewAI (Nível 5 - Ferramenta Custom + Guardrails Callback Pydantic) ---")
+    try:
+        result = await crew.kickoff_async(inputs=inputs)
+        logger.info("\n--- Execução da CrewAI Concluída ---")
+
+        logger.info("\n--- Saída Bruta da Tarefa de Scraping ---")
+        # Saída da primeira tarefa lida do próprio resultado, que vale também para cópias da crew
+        logger.info("%s", result.tasks_output[0].raw if result and result.tasks_output else "N/A")
 
-        print("\n--- Saída Final da Crew (Dados Estruturados e Validados) ---")
+        logger.info("\n--- Saída Final da Crew (Dados Estruturados e Validados) ---")
         if result and hasattr(result, 'raw'):
-             # A saída final é a saída da última tarefa (structure_data_task)
-             # Tentar parsear como JSON para visualização
-             try:
-                 final_data = json.loads(result.raw.strip().strip('```json').strip('```').strip())
-                 pprint.pprint(final_data)
-             except:
-                 print(result.raw) # Imprimir como string se não for JSON
+             # A saída final é a saída da última tarefa (structure_data_task); o
+             # callback de validação já deixou o modelo validado em result.pydantic
+             if result.pydantic is not None:
+                 logger.info("%s", result.pydantic.model_dump_json(indent=2)) # Serializado pelo pydantic-core, sem dict intermediário
+             else:
+                 # O callback não levanta exceção: saída inválida chega aqui sem modelo
+                 logger.error("A saída estruturada não passou na validação. Saída bruta:")
+                 logger.info("%s", result.raw) # Imprimir como string se não houver dados validados
         else:
-             print("A execução da crew não produziu uma saída final.")
+             logger.info("A execução da crew não produziu uma saída final.")
 
     except Exception as e:
-        print(f"\n--- Erro Capturado Durante a Execução da CrewAI ---")
-        print(f"Ocorreu um erro, possivelmente devido à falha na validação.")
+        logger.error("\n--- Erro Capturado Durante a Execução da CrewAI ---")
         # import traceback
         # traceback.print_exc()
-        print(f"Erro: {e}")
-        sys.exit(1)
\ No newline at end of file
+        logger.error("Erro: %s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())